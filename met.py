@@ -5,6 +5,7 @@ import os
 import time
 import logging
 import argparse
+import signal
 from PIL import Image
 from PIL.ExifTags import TAGS
 import requests
@@ -13,11 +14,27 @@ import shutil
 import json
 import tempfile
 import subprocess
+import selectors
+import threading
+import hashlib
+import heapq
+import itertools
+from collections import OrderedDict
+import queue
+import multiprocessing
+import multiprocessing.util
+import concurrent.futures
 from pathlib import Path
 from watchdog.observers import Observer
 from watchdog.events import FileSystemEventHandler
 from fractions import Fraction
 
+# libvips es opcional: si no está instalado se usa PIL para reescribir imágenes
+try:
+    import pyvips
+except (ImportError, OSError):
+    pyvips = None
+
 # Configuración de logging
 logging.basicConfig(
     level=logging.INFO,
@@ -29,23 +46,221 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-def custom_json_serializer(obj):
-    """Función personalizada para serializar objetos no serializables por defecto en JSON"""
-    if isinstance(obj, (int, float, str)):
-        return obj
-    elif isinstance(obj, dict):
-        return {k: custom_json_serializer(v) for k, v in obj.items()}
-    elif isinstance(obj, list):
-        return [custom_json_serializer(i) for i in obj]
-    elif isinstance(obj, tuple):
-        return tuple(custom_json_serializer(i) for i in obj)
-    elif isinstance(obj, Fraction):
+# Metadatos básicos que no se consideran sensibles
+BASIC_METADATA_KEYS = frozenset({'FileSize', 'FileName', 'FileType', 'MIMEType', 'ExifToolVersion'})
+
+# Extensiones de archivo que pueden contener metadatos
+IMAGE_EXTENSIONS = frozenset({'.jpg', '.jpeg', '.png', '.tiff', '.tif', '.webp'})
+DOCUMENT_EXTENSIONS = frozenset({'.pdf', '.docx', '.doc', '.pptx', '.xlsx', '.xls'})
+MEDIA_EXTENSIONS = frozenset({'.mp3', '.mp4', '.avi', '.mov', '.wav'})
+SUPPORTED_EXTENSIONS = IMAGE_EXTENSIONS | DOCUMENT_EXTENSIONS | MEDIA_EXTENSIONS
+
+# Extensiones que ExifTool puede reescribir (del resto solo lee los metadatos)
+EXIFTOOL_WRITABLE_EXTENSIONS = IMAGE_EXTENSIONS | frozenset({'.pdf', '.mp4', '.mov'})
+
+# Número máximo de archivos por comando de ExifTool al escanear la carpeta
+EXIFTOOL_BATCH_SIZE = 200
+
+# Longitud máxima que se conserva de cada valor de metadatos (el mensaje se trunca a 500 caracteres)
+MAX_METADATA_VALUE_LENGTH = 500
+
+# Hilos que procesan archivos en paralelo (escaneos y eventos de watchdog). Las llamadas a
+# ExifTool siguen serializadas (comparten un único proceso persistente); lo que corre a la
+# vez es QPDF y PIL/libvips
+MAX_CLEAN_WORKERS = 4
+
+# Prefijo de los archivos temporales que se crean junto al original al limpiarlo
+TEMP_FILE_PREFIX = ".metadata_cleaner_"
+
+# Antigüedad (segundos) a partir de la cual un archivo temporal se considera abandonado
+# (el proceso terminó entre su creación y el reemplazo del original)
+STALE_TEMP_SECONDS = 600
+
+# Número mínimo de archivos para repartir la extracción entre varios procesos
+PARALLEL_SCAN_THRESHOLD = 1000
+
+# Segundos sin recibir salida de ExifTool tras los que se da el proceso por colgado
+EXIFTOOL_TIMEOUT = 120
+
+def is_temp_file(path):
+    """Indica si una ruta corresponde a un archivo temporal creado por el limpiador"""
+    return os.path.basename(path).startswith(TEMP_FILE_PREFIX)
+
+def start_exiftool():
+    """Arranca un proceso de ExifTool persistente (-stay_open) que recibe comandos por stdin"""
+    return subprocess.Popen(
+        ['exiftool', '-stay_open', 'True', '-@', '-'],
+        stdin=subprocess.PIPE,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        bufsize=0
+    )
+
+def stop_exiftool(process):
+    """Pide a un proceso persistente de ExifTool que termine y espera a que salga (o lo mata)"""
+    if process.poll() is not None:
+        return
+    try:
+        _write_all(process.stdin, b"-stay_open\nFalse\n")
+        process.stdin.close()
+        process.wait(timeout=5)
+    except (OSError, subprocess.TimeoutExpired):
+        process.kill()
+        process.wait()
+
+def _read_until_ready(process, timeout=EXIFTOOL_TIMEOUT):
+    """
+    Lee stdout y stderr de ExifTool a la vez hasta encontrar el marcador {ready} en ambos
+    
+    Leer los dos pipes en paralelo evita el bloqueo mutuo cuando ExifTool llena
+    el buffer de stderr con avisos mientras esperamos su salida estándar.
+    
+    Args:
+        process (subprocess.Popen): Proceso arrancado con start_exiftool
+        timeout (float): Segundos máximos de espera sin recibir datos
+    
+    Raises:
+        TimeoutError: Si ExifTool deja de responder (colgado o sin soporte de -echo4)
+    
+    Returns:
+        tuple: (bytes salida estándar, bytes salida de error)
+    """
+    pending = {process.stdout.fileno(): [], process.stderr.fileno(): []}
+    tails = dict.fromkeys(pending, b"")
+    done = {}
+    with selectors.DefaultSelector() as selector:
+        for fd in pending:
+            selector.register(fd, selectors.EVENT_READ)
+        while len(done) < len(pending):
+            events = selector.select(timeout)
+            if not events:
+                raise TimeoutError(f"ExifTool no respondió en {timeout} segundos")
+            for key, _ in events:
+                fd = key.fd
+                chunk = os.read(fd, 65536)
+                if not chunk:
+                    raise RuntimeError("ExifTool terminó inesperadamente")
+                # Acumular en lista y unir al final: concatenar bytes es cuadrático con salidas grandes
+                pending[fd].append(chunk)
+                # El marcador puede quedar partido entre dos lecturas
+                tails[fd] = (tails[fd] + chunk)[-32:]
+                if tails[fd].rstrip().endswith(b"{ready}"):
+                    selector.unregister(fd)
+                    done[fd] = b"".join(pending[fd]).rstrip()[:-len(b"{ready}")]
+    return done[process.stdout.fileno()], done[process.stderr.fileno()]
+
+def _write_all(stream, data):
+    """Escribe todos los bytes en un pipe sin buffer, que puede aceptar solo una parte en cada llamada"""
+    view = memoryview(data)
+    while view:
+        written = stream.write(view)
+        view = view[written:]
+
+def exiftool_execute(process, args):
+    """
+    Envía un comando a un proceso persistente de ExifTool y espera su respuesta
+    
+    Args:
+        process (subprocess.Popen): Proceso arrancado con start_exiftool
+        args (list): Argumentos de ExifTool (uno por línea)
+        
+    Returns:
+        tuple: (bytes salida estándar, str salida de error)
+    """
+    # En el archivo de argumentos cada línea es un argumento: una ruta con saltos de línea
+    # se convertiría en varias opciones (p. ej. -if con código Perl). Esas rutas se pasan
+    # por argv a un proceso independiente, como antes de usar -stay_open.
+    if any('\n' in arg or '\r' in arg for arg in args):
+        result = subprocess.run(
+            ['exiftool'] + list(args),
+            stdin=subprocess.DEVNULL,
+            capture_output=True,
+            timeout=EXIFTOOL_TIMEOUT,
+            check=False
+        )
+        return result.stdout, result.stderr.decode('utf-8', 'replace').strip()
+    
+    # -echo4 escribe el marcador en stderr una vez procesado el comando
+    command = b"".join(os.fsencode(arg) + b"\n" for arg in args)
+    _write_all(process.stdin, command + b"-echo4\n{ready}\n-execute\n")
+    stdout, stderr = _read_until_ready(process)
+    return stdout, stderr.decode('utf-8', 'replace').strip()
+
+def compact_metadata(entry):
+    """
+    Reduce los metadatos de un archivo a lo necesario para notificarlos
+    
+    Descarta los metadatos básicos no sensibles y recorta los valores de texto
+    largos, de modo que lo que se conserva por archivo depende del número de
+    campos y no del tamaño de sus valores.
+    """
+    compact = {}
+    for key, value in entry.items():
+        if key in BASIC_METADATA_KEYS:
+            continue
+        if isinstance(value, str) and len(value) > MAX_METADATA_VALUE_LENGTH:
+            value = value[:MAX_METADATA_VALUE_LENGTH] + "... [truncado]"
+        compact[key] = value
+    return compact
+
+def parse_exiftool_batch(stdout):
+    """Convierte la salida -json de ExifTool en un diccionario indexado por ruta"""
+    results = {}
+    for entry in json.loads(stdout):
+        source = entry.get('SourceFile')
+        if source:
+            results[os.path.normpath(source)] = compact_metadata(entry)
+    return results
+
+# Proceso de ExifTool propio de cada proceso trabajador del pool
+_worker_exiftool = None
+
+def _init_extract_worker():
+    """Inicializa un proceso trabajador con su propio ExifTool persistente"""
+    global _worker_exiftool
+    _worker_exiftool = start_exiftool()
+    # Cerrar ExifTool de forma ordenada cuando el trabajador termine (pool.close() + join())
+    multiprocessing.util.Finalize(None, stop_exiftool, args=(_worker_exiftool,), exitpriority=10)
+
+def extract_batch(file_paths):
+    """
+    Extrae los metadatos de una porción de archivos dentro de un proceso trabajador
+    
+    Args:
+        file_paths (list): Rutas de los archivos
+        
+    Returns:
+        dict: Metadatos indexados por ruta de archivo
+    """
+    results = {}
+    for start in range(0, len(file_paths), EXIFTOOL_BATCH_SIZE):
+        batch = file_paths[start:start + EXIFTOOL_BATCH_SIZE]
+        try:
+            stdout, stderr = exiftool_execute(_worker_exiftool, ['-json'] + batch)
+            if not stdout.strip():
+                logger.error(f"Error al obtener metadatos con ExifTool: {stderr}")
+                continue
+            results.update(parse_exiftool_batch(stdout))
+        except (TimeoutError, RuntimeError, OSError) as e:
+            # El proceso quedó colgado o a mitad de una respuesta: sustituirlo por uno nuevo
+            logger.error(f"Error al usar ExifTool, se reinicia: {str(e)}")
+            _worker_exiftool.kill()
+            _worker_exiftool.wait()
+            _init_extract_worker()
+        except Exception as e:
+            logger.error(f"Error al usar ExifTool: {str(e)}")
+    return results
+
+def json_default(obj):
+    """Convierte a JSON los valores que el codificador estándar no sabe serializar"""
+    if isinstance(obj, Fraction):
         return float(obj)
-    else:
-        return str(obj)
+    elif isinstance(obj, (bytes, bytearray)):
+        return obj.decode('utf-8', 'replace')
+    return str(obj)
 
 class MetadataCleaner:
-    def __init__(self, folder_path, telegram_token, chat_id, interval=60):
+    def __init__(self, folder_path, telegram_token, chat_id, interval=60, report_only=False, report_tags=False):
         """
         Inicializa el limpiador de metadatos
         
@@ -54,20 +269,49 @@ class MetadataCleaner:
             telegram_token (str): Token del bot de Telegram
             chat_id (str): ID del chat donde enviar los mensajes
             interval (int): Intervalo de escaneo en segundos cuando no se usa watchdog
+            report_only (bool): Solo notificar los metadatos encontrados, sin limpiarlos
+            report_tags (bool): Notificar los metadatos encontrados antes de limpiarlos
         """
         self.folder_path = os.path.abspath(folder_path)
         self.telegram_token = telegram_token
         self.chat_id = chat_id
         self.interval = interval
+        self.report_only = report_only
+        self.report_tags = report_tags
         self.telegram_api_url = f"https://api.telegram.org/bot{telegram_token}/sendMessage"
         
-        # Crear carpeta temporal si no existe
-        self.temp_folder = os.path.join(self.folder_path, "_temp_metadata_cleaner")
-        os.makedirs(self.temp_folder, exist_ok=True)
+        # Los mensajes se envían desde un hilo en segundo plano reutilizando la conexión HTTP
+        self._sess = requests.Session()
+        self._sess.headers['Content-Type'] = 'application/json'
+        self._tg_body_prefix = json.dumps({'chat_id': chat_id, 'parse_mode': 'HTML'})[:-1].encode() + b', "text": '
+        self._tg_q = queue.Queue()
+        self._tg_thread = threading.Thread(target=self._tg_worker, daemon=True)
+        self._tg_thread.start()
+        
+        # Pool persistente de hilos para procesar archivos en paralelo
+        self._pool = concurrent.futures.ThreadPoolExecutor(max_workers=MAX_CLEAN_WORKERS)
+        
+        # Señal de parada del bucle de schedule y observador activo en modo watchdog
+        self._stop_event = threading.Event()
+        self._observer = None
+        
+        # Fecha de modificación de los archivos ya procesados, para no volver a analizarlos
+        self._seen = {}
+        
+        # Extensiones que ExifTool ha indicado que no puede escribir
+        self._unwritable = set()
         
         # Verificar las herramientas externas necesarias
         self._check_required_tools()
         
+        # Proceso persistente de ExifTool (modo -stay_open) compartido por todas las llamadas
+        self._et = None
+        self._et_lock = threading.Lock()
+        # Tras close() no se vuelve a arrancar ExifTool
+        self._closed = False
+        if self.available_tools.get('exiftool', False):
+            self._start_exiftool()
+        
         logger.info(f"Iniciando monitoreo en: {self.folder_path}")
         self.send_telegram_message("🟢 Monitor de metadatos iniciado")
 
@@ -75,33 +319,88 @@ class MetadataCleaner:
         """Verifica si las herramientas externas necesarias están instaladas"""
         tools_status = {}
         
-        # Verificar exiftool (para múltiples formatos)
-        try:
-            subprocess.run(['exiftool', '-ver'], capture_output=True, text=True, check=False)
-            tools_status['exiftool'] = True
-        except (FileNotFoundError, subprocess.SubprocessError):
-            tools_status['exiftool'] = False
+        # Verificar exiftool (para múltiples formatos) con una búsqueda en el PATH, sin lanzar procesos
+        tools_status['exiftool'] = shutil.which('exiftool') is not None
+        if not tools_status['exiftool']:
             logger.warning("ExifTool no encontrado. La limpieza de metadatos será limitada.")
         
         # Verificar qpdf (para PDFs)
-        try:
-            subprocess.run(['qpdf', '--version'], capture_output=True, text=True, check=False)
-            tools_status['qpdf'] = True
-        except (FileNotFoundError, subprocess.SubprocessError):
-            tools_status['qpdf'] = False
+        tools_status['qpdf'] = shutil.which('qpdf') is not None
+        if not tools_status['qpdf']:
             logger.warning("QPDF no encontrado. La limpieza de metadatos de PDF será limitada.")
         
         self.available_tools = tools_status
 
+    def _start_exiftool(self):
+        """Arranca el proceso persistente de ExifTool del limpiador"""
+        try:
+            self._et = start_exiftool()
+        except (FileNotFoundError, OSError) as e:
+            logger.error(f"No se pudo iniciar ExifTool en modo stay_open: {str(e)}")
+            self._et = None
+            self.available_tools['exiftool'] = False
+
+    def _et_cmd(self, args):
+        """
+        Ejecuta un comando en el proceso persistente de ExifTool
+        
+        Las llamadas desde distintos hilos se serializan con _et_lock. Si ExifTool
+        deja de responder o se cae a mitad de una respuesta, el proceso se mata y se
+        arranca uno nuevo para que los comandos siguientes no lean una salida desfasada.
+        
+        Args:
+            args (list): Argumentos de ExifTool (uno por línea)
+            
+        Returns:
+            tuple: (bytes salida estándar, str salida de error)
+        """
+        with self._et_lock:
+            if self._closed:
+                raise RuntimeError("El limpiador de metadatos está cerrado")
+            if self._et is None or self._et.poll() is not None:
+                self._start_exiftool()
+                if self._et is None:
+                    raise RuntimeError("ExifTool no disponible")
+            try:
+                return exiftool_execute(self._et, args)
+            except (TimeoutError, RuntimeError, OSError):
+                logger.error("ExifTool no respondió correctamente, se reinicia el proceso")
+                self._et.kill()
+                self._et.wait()
+                self._start_exiftool()
+                raise
+
+    def close(self):
+        """Termina el trabajo pendiente, envía los mensajes de Telegram y cierra el proceso persistente de ExifTool"""
+        self._pool.shutdown(wait=True)
+        self._tg_q.put(None)
+        self._tg_thread.join(timeout=30)
+        
+        with self._et_lock:
+            self._closed = True
+            if self._et is None:
+                return
+            stop_exiftool(self._et)
+            self._et = None
+
     def send_telegram_message(self, message):
+        """Encola un mensaje para enviarlo a Telegram sin bloquear el escaneo"""
+        self._tg_q.put(message)
+
+    def _tg_worker(self):
+        """Hilo que vacía la cola de mensajes de Telegram hasta recibir None"""
+        while True:
+            message = self._tg_q.get()
+            if message is None:
+                break
+            self._post_telegram_message(message)
+
+    def _post_telegram_message(self, message):
         """Envía mensaje a Telegram"""
         try:
-            payload = {
-                'chat_id': self.chat_id,
-                'text': message,
-                'parse_mode': 'HTML'
-            }
-            response = requests.post(self.telegram_api_url, data=payload)
+            # Solo se codifica el texto; el resto del cuerpo JSON se construye una vez en __init__
+            payload = self._tg_body_prefix + json.dumps(message).encode() + b"}"
+            response = self._sess.post(self.telegram_api_url, data=payload, timeout=10)
             if response.status_code != 200:
                 logger.error(f"Error al enviar mensaje a Telegram: {response.text}")
             return response.status_code == 200
@@ -123,23 +422,77 @@ class MetadataCleaner:
             return {"error": "ExifTool no disponible"}
             
         try:
-            result = subprocess.run(
-                ['exiftool', '-json', file_path], 
-                capture_output=True, 
-                text=True, 
-                check=False
-            )
+            stdout, stderr = self._et_cmd(['-json', file_path])
             
-            if result.returncode != 0:
-                logger.error(f"Error al obtener metadatos con ExifTool: {result.stderr}")
+            if not stdout.strip():
+                logger.error(f"Error al obtener metadatos con ExifTool: {stderr}")
                 return {}
                 
-            metadata = json.loads(result.stdout)
-            return metadata[0] if metadata else {}
+            metadata = json.loads(stdout)
+            return compact_metadata(metadata[0]) if metadata else {}
         except Exception as e:
             logger.error(f"Error al usar ExifTool: {str(e)}")
             return {}
 
+    def get_metadata_batch(self, file_paths):
+        """
+        Obtiene los metadatos de varios archivos con una sola llamada a ExifTool
+        
+        Args:
+            file_paths (list): Rutas de los archivos
+            
+        Returns:
+            dict: Metadatos indexados por ruta de archivo
+        """
+        results = {}
+        if not file_paths or not self.available_tools.get('exiftool', False):
+            return results
+            
+        try:
+            # Sin -b, ExifTool sustituye los datos binarios (miniaturas, etc.) por un marcador corto
+            stdout, stderr = self._et_cmd(['-json'] + list(file_paths))
+            
+            if not stdout.strip():
+                logger.error(f"Error al obtener metadatos con ExifTool: {stderr}")
+                return results
+                
+            results = parse_exiftool_batch(stdout)
+        except Exception as e:
+            logger.error(f"Error al usar ExifTool: {str(e)}")
+        return results
+
+    def get_metadata_parallel(self, file_paths):
+        """
+        Reparte la extracción de metadatos entre varios procesos, cada uno con su ExifTool
+        
+        Args:
+            file_paths (list): Rutas de los archivos
+            
+        Returns:
+            dict: Metadatos indexados por ruta de archivo
+        """
+        workers = os.cpu_count() or 1
+        chunks = [file_paths[i::workers] for i in range(workers)]
+        results = {}
+        # Para entonces el proceso ya tiene hilos (Telegram, pool de limpieza, watchdog), y hacer
+        # fork con hilos activos no es seguro: los trabajadores se arrancan con 'spawn'.
+        # El pool y sus N ExifTool se crean en cada escaneo grande; solo se usa por encima de
+        # PARALLEL_SCAN_THRESHOLD archivos, donde ese arranque queda amortizado.
+        context = multiprocessing.get_context('spawn')
+        pool = context.Pool(workers, initializer=_init_extract_worker)
+        try:
+            for partial in pool.imap_unordered(extract_batch, chunks):
+                results.update(partial)
+            # close() deja salir a los trabajadores con normalidad para que cierren su ExifTool;
+            # terminate() (lo que hace el bloque with) los mataría sin ejecutar los finalizadores
+            pool.close()
+        except Exception as e:
+            logger.error(f"Error en la extracción paralela de metadatos: {str(e)}")
+            pool.terminate()
+        finally:
+            pool.join()
+        return results
+
     def has_metadata(self, file_path):
         """
         Comprueba si un archivo tiene metadatos
@@ -155,22 +508,17 @@ class MetadataCleaner:
             
             # Usar ExifTool si está disponible para todos los tipos de archivos
             if self.available_tools.get('exiftool', False):
+                # Los metadatos básicos que no son sensibles ya vienen filtrados
                 metadata = self.get_metadata_with_exiftool(file_path)
-                # Filtrar metadatos básicos que no son sensibles
-                filtered_metadata = {k: v for k, v in metadata.items() 
-                                   if k not in ['FileSize', 'FileName', 'FileType', 'MIMEType', 'ExifToolVersion']}
-                return bool(filtered_metadata), filtered_metadata
+                return bool(metadata), metadata
             
             # Métodos alternativos si ExifTool no está disponible
             # Imágenes (JPG, PNG, TIFF, etc.)
-            if extension in ['.jpg', '.jpeg', '.png', '.tiff', '.tif', '.webp']:
+            if extension in IMAGE_EXTENSIONS:
                 try:
                     with Image.open(file_path) as img:
-                        exif_data = {}
-                        if hasattr(img, '_getexif') and img._getexif():
-                            for tag_id, value in img._getexif().items():
-                                tag = TAGS.get(tag_id, tag_id)
-                                exif_data[tag] = value
+                        raw_exif = img._getexif() if hasattr(img, '_getexif') else None
+                        exif_data = {TAGS.get(tag_id, tag_id): value for tag_id, value in (raw_exif or {}).items()}
                         
                         # Comprobar otros metadatos (IPTC, XMP)
                         if hasattr(img, 'info') and img.info:
@@ -184,11 +532,11 @@ class MetadataCleaner:
                     return False, {}
             
             # Documentos PDF, DOCX, etc. - Simplemente indicamos que podrían tener metadatos
-            elif extension in ['.pdf', '.docx', '.doc', '.pptx', '.xlsx', '.xls']:
+            elif extension in DOCUMENT_EXTENSIONS:
                 return True, {"warning": "Archivo potencialmente con metadatos"}
             
             # Archivos multimedia
-            elif extension in ['.mp3', '.mp4', '.avi', '.mov', '.wav']:
+            elif extension in MEDIA_EXTENSIONS:
                 return True, {"warning": "Archivo multimedia potencialmente con metadatos"}
                 
             return False, {}
@@ -208,26 +556,24 @@ class MetadataCleaner:
         """
         try:
             extension = os.path.splitext(file_path)[1].lower()
-            filename = os.path.basename(file_path)
-            temp_file = os.path.join(self.temp_folder, filename)
+            
+            if not self.can_clean(file_path):
+                logger.warning(f"No hay ningún método para limpiar archivos {extension}")
+                return False
             
             # Usar ExifTool si está disponible (método más efectivo para la mayoría de archivos)
-            if self.available_tools.get('exiftool', False):
+            if self._exiftool_can_write(extension):
                 try:
-                    # Crear una copia limpia con todos los metadatos eliminados
-                    result = subprocess.run(
-                        ['exiftool', '-all=', '-o', temp_file, file_path],
-                        capture_output=True,
-                        text=True,
-                        check=False
-                    )
+                    # Eliminar todos los metadatos reescribiendo el archivo original en su sitio
+                    stdout, stderr = self._et_cmd(['-all=', '-overwrite_original_in_place', file_path])
                     
-                    if result.returncode != 0:
-                        logger.error(f"Error al limpiar metadatos con ExifTool: {result.stderr}")
+                    if b"weren't updated" in stdout or 'Error' in stderr:
+                        logger.error(f"Error al limpiar metadatos con ExifTool: {stderr}")
+                        if 'not yet supported' in stderr or "Can't currently write" in stderr:
+                            # El formato no se puede escribir: no volver a intentarlo con ExifTool
+                            self._unwritable.add(extension)
                         # Si falla con ExifTool, intentamos con métodos específicos
                     else:
-                        # Reemplazar el archivo original
-                        shutil.move(temp_file, file_path)
                         return True
                 except Exception as e:
                     logger.error(f"Error con ExifTool: {str(e)}")
@@ -257,30 +603,27 @@ class MetadataCleaner:
                 return False  # No se pudo limpiar
                 
             # Imágenes
-            elif extension in ['.jpg', '.jpeg', '.png', '.tiff', '.tif', '.webp']:
+            elif extension in IMAGE_EXTENSIONS:
+                temp_file = None
                 try:
-                    with Image.open(file_path) as img:
-                        # Crear nueva imagen sin metadatos
-                        img_without_exif = Image.new(img.mode, img.size)
-                        img_without_exif.putdata(list(img.getdata()))
-                        img_without_exif.save(temp_file)
+                    # Archivo temporal junto al original para reemplazarlo de forma atómica
+                    fd, temp_file = tempfile.mkstemp(
+                        dir=os.path.dirname(file_path),
+                        prefix=TEMP_FILE_PREFIX,
+                        suffix=extension
+                    )
+                    os.close(fd)
+                    self._rewrite_image(file_path, temp_file)
                     
-                    # Reemplazar el archivo original
-                    shutil.move(temp_file, file_path)
+                    # Reemplazar el archivo original conservando sus permisos (mkstemp crea con 0600)
+                    shutil.copymode(file_path, temp_file)
+                    os.replace(temp_file, file_path)
                     return True
                 except Exception as e:
                     logger.error(f"Error al limpiar metadatos de imagen {file_path}: {str(e)}")
+                    if temp_file is not None and os.path.exists(temp_file):
+                        os.remove(temp_file)
                     return False
-            
-            # Documentos Office (DOCX, DOC, etc.)
-            elif extension in ['.docx', '.xlsx', '.pptx']:
-                logger.warning(f"Limpieza manual para archivos Office {extension}")
-                return False
-                
-            # Archivos multimedia
-            elif extension in ['.mp3', '.mp4', '.avi', '.mov', '.wav']:
-                logger.warning(f"Limpieza de metadatos para archivos multimedia {extension} no implementada")
-                return False
                 
             logger.warning(f"No se implementó limpieza para el tipo de archivo: {extension}")
             return False
@@ -289,45 +632,121 @@ class MetadataCleaner:
             logger.error(f"Error al limpiar metadatos de {file_path}: {str(e)}")
             return False
 
+    def _exiftool_can_write(self, extension):
+        """Indica si ExifTool está disponible y puede reescribir archivos con esta extensión"""
+        return (
+            self.available_tools.get('exiftool', False)
+            and extension in EXIFTOOL_WRITABLE_EXTENSIONS
+            and extension not in self._unwritable
+        )
+
+    def can_clean(self, file_path):
+        """
+        Indica si existe algún método para limpiar los metadatos de un archivo
+        
+        Args:
+            file_path (str): Ruta al archivo
+        
+        Returns:
+            bool: False si el tipo de archivo no se puede limpiar con las herramientas disponibles
+        """
+        extension = os.path.splitext(file_path)[1].lower()
+        if self._exiftool_can_write(extension) or extension in IMAGE_EXTENSIONS:
+            return True
+        return extension == '.pdf' and self.available_tools.get('qpdf', False)
+
+    def _notify_clean_failure(self, file_path):
+        """
+        Notifica que no se pudieron eliminar los metadatos de un archivo
+        
+        Returns:
+            bool: True si el fallo es permanente (tipo de archivo que no se puede limpiar),
+            False si conviene reintentarlo en el próximo escaneo
+        """
+        relative_path = os.path.relpath(file_path, self.folder_path)
+        if not self.can_clean(file_path):
+            # Se recuerda como procesado: solo se volverá a avisar si el archivo cambia
+            self.send_telegram_message(f"⚠️ No se pueden eliminar los metadatos de este tipo de archivo: {relative_path}")
+            logger.warning(f"Tipo de archivo sin limpieza disponible: {file_path}")
+            return True
+        
+        self.send_telegram_message(f"❌ Error al eliminar metadatos de: {relative_path}")
+        logger.error(f"Error al eliminar metadatos de: {file_path}")
+        return False
+
+    def _rewrite_image(self, file_path, output_path):
+        """
+        Guarda una copia de la imagen sin metadatos
+        
+        Args:
+            file_path (str): Ruta a la imagen original
+            output_path (str): Ruta donde guardar la copia limpia
+        """
+        if pyvips is not None:
+            try:
+                # libvips procesa la imagen por bloques en streaming y usa códecs optimizados
+                pyvips.Image.new_from_file(file_path, access='sequential').write_to_file(output_path, strip=True)
+                return
+            except pyvips.Error as e:
+                logger.warning(f"libvips no pudo procesar {file_path}, se usará PIL: {str(e)}")
+        
+        with Image.open(file_path) as img:
+            # Crear nueva imagen sin metadatos copiando el buffer de píxeles en bloque
+            img_without_exif = Image.frombytes(img.mode, img.size, img.tobytes())
+            if img.mode == 'P':
+                img_without_exif.putpalette(img.getpalette())
+            img_without_exif.save(output_path, format=img.format)
+
     def scan_folder(self):
         """Escanea la carpeta en busca de archivos con metadatos"""
         logger.info(f"Escaneando carpeta: {self.folder_path}")
         files_with_metadata = 0
 
-        for root, _, files in os.walk(self.folder_path):
-            # Saltar la carpeta temporal
-            if self.temp_folder in root:
+        # Solo se consultan los archivos con extensiones que pueden tener metadatos
+        # y que son nuevos o han cambiado desde el escaneo anterior
+        current = {}
+        file_paths = []
+        for entry in self._walk(self.folder_path):
+            name = entry.name
+            extension = name[name.rfind('.'):].lower() if '.' in name else ''
+            if extension not in SUPPORTED_EXTENSIONS:
                 continue
-                
-            for file in files:
-                file_path = os.path.join(root, file)
-                has_meta, metadata = self.has_metadata(file_path)
-                
-                if has_meta:
-                    files_with_metadata += 1
-                    relative_path = os.path.relpath(file_path, self.folder_path)
-                    metadata_str = json.dumps(custom_json_serializer(metadata), indent=2) if isinstance(metadata, dict) else str(metadata)
-                    
-                    # Limitar longitud del mensaje
-                    if len(metadata_str) > 500:
-                        metadata_str = metadata_str[:500] + "... [truncado]"
-                    
-                    message = (
-                        f"🔍 <b>Archivo con metadatos detectado:</b>\n"
-                        f"📁 {relative_path}\n"
-                        f"📊 <pre>{metadata_str}</pre>"
-                    )
-                    
-                    self.send_telegram_message(message)
-                    logger.info(f"Encontrados metadatos en: {file_path}")
-                    
-                    # Limpiar metadatos
-                    if self.clean_metadata(file_path):
-                        self.send_telegram_message(f"✅ Metadatos eliminados de: {relative_path}")
-                        logger.info(f"Metadatos eliminados de: {file_path}")
-                    else:
-                        self.send_telegram_message(f"❌ Error al eliminar metadatos de: {relative_path}")
-                        logger.error(f"Error al eliminar metadatos de: {file_path}")
+            try:
+                mtime = entry.stat().st_mtime
+            except OSError:
+                continue
+            current[entry.path] = mtime
+            if self._seen.get(entry.path) != mtime:
+                file_paths.append(entry.path)
+        
+        # Olvidar los archivos que ya no existen
+        self._seen = {path: mtime for path, mtime in self._seen.items() if path in current}
+        
+        # Sin notificar las etiquetas y con ExifTool no hace falta consultarlas: se limpia directamente
+        probe = self._needs_probe()
+        
+        # Sin ExifTool se comprueba archivo a archivo con los métodos alternativos
+        metadata_by_path = None
+        if probe and self.available_tools.get('exiftool', False):
+            if len(file_paths) > PARALLEL_SCAN_THRESHOLD and (os.cpu_count() or 1) > 1:
+                metadata_by_path = self.get_metadata_parallel(file_paths)
+            else:
+                # Una sola llamada a ExifTool por lote
+                metadata_by_path = {}
+                for start in range(0, len(file_paths), EXIFTOOL_BATCH_SIZE):
+                    metadata_by_path.update(self.get_metadata_batch(file_paths[start:start + EXIFTOOL_BATCH_SIZE]))
+        
+        for file_path, ok, found in self._iter_scan_results(file_paths, probe, metadata_by_path):
+            if found:
+                files_with_metadata += 1
+            if not ok:
+                # Se reintentará en el próximo escaneo
+                continue
+            
+            try:
+                self._seen[file_path] = os.stat(file_path).st_mtime
+            except OSError:
+                self._seen.pop(file_path, None)
         
         if files_with_metadata == 0:
             logger.info("No se encontraron archivos con metadatos")
@@ -336,6 +755,203 @@ class MetadataCleaner:
         
         return files_with_metadata
 
+    def _iter_scan_results(self, file_paths, probe, metadata_by_path):
+        """
+        Procesa los archivos del escaneo en el pool de hilos y devuelve sus resultados a medida que terminan
+        
+        Las llamadas a ExifTool quedan serializadas por _et_lock, pero los métodos
+        alternativos (QPDF, PIL/libvips) se solapan entre hilos. Se mantienen como
+        mucho MAX_CLEAN_WORKERS tareas en vuelo para que los eventos de watchdog no
+        esperen detrás de todo el escaneo.
+        
+        Yields:
+            tuple: (str ruta, bool procesado_correctamente, bool tenía_metadatos)
+        """
+        in_flight = {}
+        remaining = iter(file_paths)
+        while True:
+            for file_path in remaining:
+                in_flight[self._pool.submit(self._process_scanned_file, file_path, probe, metadata_by_path)] = file_path
+                if len(in_flight) >= MAX_CLEAN_WORKERS:
+                    break
+            if not in_flight:
+                return
+            
+            finished, _ = concurrent.futures.wait(in_flight, return_when=concurrent.futures.FIRST_COMPLETED)
+            for future in finished:
+                file_path = in_flight.pop(future)
+                try:
+                    ok, found = future.result()
+                except Exception as e:
+                    logger.error(f"Error al procesar {file_path}: {str(e)}")
+                    continue
+                yield file_path, ok, found
+
+    def _needs_probe(self):
+        """
+        Indica si hay que consultar los metadatos antes de limpiar
+        
+        Solo ExifTool deja intacto un archivo sin metadatos; los métodos alternativos
+        (PIL, QPDF) lo reescriben siempre, así que sin ExifTool se consulta primero.
+        """
+        return self.report_only or self.report_tags or not self.available_tools.get('exiftool', False)
+
+    def _process_scanned_file(self, file_path, probe, metadata_by_path, title="🔍 <b>Archivo con metadatos detectado:</b>"):
+        """
+        Procesa un archivo según la política configurada
+        
+        Args:
+            file_path (str): Ruta al archivo
+            probe (bool): Consultar los metadatos antes de limpiar
+            metadata_by_path (dict): Metadatos ya extraídos por lotes, o None
+            title (str): Encabezado del mensaje de Telegram al notificar los metadatos
+        
+        Returns:
+            tuple: (bool procesado_correctamente, bool tenía_metadatos)
+        """
+        if not probe:
+            return self.clean_and_notify(file_path)
+        
+        if metadata_by_path is not None:
+            key = os.path.normpath(file_path)
+            if key not in metadata_by_path:
+                # ExifTool no devolvió resultado (proceso caído, JSON inválido...): reintentar después
+                return False, False
+            metadata = metadata_by_path[key]
+            has_meta = bool(metadata)
+        else:
+            has_meta, metadata = self.has_metadata(file_path)
+        
+        if not has_meta:
+            return True, False
+        if self.report_only or self.report_tags:
+            return self.report_and_clean(file_path, metadata, title), True
+        
+        # Modo por defecto sin ExifTool: limpiar sin notificar las etiquetas
+        ok, _ = self.clean_and_notify(file_path)
+        return ok, True
+
+    def submit(self, fn, *args):
+        """Encola una tarea en el pool de hilos del limpiador"""
+        return self._pool.submit(fn, *args)
+
+    def _walk(self, root):
+        """
+        Recorre recursivamente una carpeta con os.scandir y devuelve las entradas de los archivos
+        
+        Los archivos temporales del limpiador no se devuelven; los abandonados se eliminan.
+        """
+        try:
+            with os.scandir(root) as entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        yield from self._walk(entry.path)
+                    elif not entry.is_file():
+                        continue
+                    elif is_temp_file(entry.name):
+                        self._remove_stale_temp(entry)
+                    else:
+                        yield entry
+        except OSError as e:
+            logger.error(f"Error al leer la carpeta {root}: {str(e)}")
+
+    def _remove_stale_temp(self, entry):
+        """Elimina un archivo temporal del limpiador si lleva más de STALE_TEMP_SECONDS sin modificarse"""
+        try:
+            if time.time() - entry.stat().st_mtime < STALE_TEMP_SECONDS:
+                # Puede pertenecer a una limpieza en curso
+                return
+            os.remove(entry.path)
+            logger.info(f"Eliminado archivo temporal abandonado: {entry.path}")
+        except OSError as e:
+            logger.warning(f"No se pudo eliminar el archivo temporal {entry.path}: {str(e)}")
+
+    def process_file(self, file_path, title="🔍 <b>Archivo con metadatos detectado:</b>"):
+        """
+        Aplica a un archivo la política configurada: limpiar directamente o notificar antes
+        
+        Args:
+            file_path (str): Ruta al archivo
+            title (str): Encabezado del mensaje de Telegram al notificar los metadatos
+        
+        Returns:
+            bool: True si el archivo quedó procesado, False si hubo un error al limpiarlo
+        """
+        ok, _ = self._process_scanned_file(file_path, self._needs_probe(), None, title)
+        return ok
+
+    def clean_and_notify(self, file_path):
+        """
+        Limpia un archivo sin consultar antes sus metadatos y notifica solo si cambió
+        
+        ExifTool no modifica el archivo cuando no hay nada que eliminar, así que
+        basta con comparar la fecha de modificación y el tamaño antes y después.
+        
+        Args:
+            file_path (str): Ruta al archivo
+        
+        Returns:
+            tuple: (bool procesado_correctamente, bool archivo_modificado)
+        """
+        relative_path = os.path.relpath(file_path, self.folder_path)
+        try:
+            before = os.stat(file_path)
+        except OSError:
+            return True, False
+        
+        if not self.clean_metadata(file_path):
+            return self._notify_clean_failure(file_path), False
+        
+        try:
+            after = os.stat(file_path)
+        except OSError:
+            return True, False
+        
+        changed = (before.st_mtime_ns, before.st_size) != (after.st_mtime_ns, after.st_size)
+        if changed:
+            self.send_telegram_message(f"✅ Metadatos eliminados de: {relative_path}")
+            logger.info(f"Metadatos eliminados de: {file_path}")
+        return True, changed
+
+    def report_and_clean(self, file_path, metadata, title="🔍 <b>Archivo con metadatos detectado:</b>"):
+        """
+        Notifica los metadatos encontrados en un archivo y los elimina (salvo en modo solo informe)
+        
+        Args:
+            file_path (str): Ruta al archivo
+            metadata (dict): Metadatos encontrados
+            title (str): Encabezado del mensaje de Telegram
+        
+        Returns:
+            bool: True si el archivo quedó procesado, False si hay que reintentar la limpieza
+        """
+        relative_path = os.path.relpath(file_path, self.folder_path)
+        metadata_str = json.dumps(metadata, indent=2, default=json_default) if isinstance(metadata, dict) else str(metadata)
+        
+        # Limitar longitud del mensaje
+        if len(metadata_str) > 500:
+            metadata_str = metadata_str[:500] + "... [truncado]"
+        
+        message = (
+            f"{title}\n"
+            f"📁 {relative_path}\n"
+            f"📊 <pre>{metadata_str}</pre>"
+        )
+        
+        self.send_telegram_message(message)
+        logger.info(f"Encontrados metadatos en: {file_path}")
+        
+        if self.report_only:
+            return True
+        
+        # Limpiar metadatos
+        if self.clean_metadata(file_path):
+            self.send_telegram_message(f"✅ Metadatos eliminados de: {relative_path}")
+            logger.info(f"Metadatos eliminados de: {file_path}")
+            return True
+        
+        return self._notify_clean_failure(file_path)
+
     def run_continuous(self):
         """Ejecuta el escáner en modo continuo con schedule"""
         self.scan_folder()  # Escaneo inicial
@@ -344,14 +960,15 @@ class MetadataCleaner:
         schedule.every(self.interval).seconds.do(self.scan_folder)
         
         try:
-            while True:
+            while not self._stop_event.is_set():
                 schedule.run_pending()
-                time.sleep(1)
+                # Dormir hasta el siguiente escaneo programado (máximo 60 s) o hasta que se pida parar
+                idle = schedule.idle_seconds()
+                self._stop_event.wait(min(max(idle, 0), 60) if idle is not None else 60)
         except KeyboardInterrupt:
-            logger.info("Deteniendo monitor de metadatos...")
-            self.send_telegram_message("🔴 Monitor de metadatos detenido")
-            # Limpiar carpeta temporal
-            shutil.rmtree(self.temp_folder, ignore_errors=True)
+            pass
+        
+        self._shutdown()
 
     def run_watchdog(self):
         """Ejecuta el monitor usando watchdog para eventos de sistema de archivos"""
@@ -361,6 +978,7 @@ class MetadataCleaner:
         # Configurar observador
         observer = Observer()
         observer.schedule(event_handler, self.folder_path, recursive=True)
+        self._observer = observer
         
         # Iniciar observador
         observer.start()
@@ -368,131 +986,208 @@ class MetadataCleaner:
         # Escaneo inicial
         self.scan_folder()
         
+        # Bloquear hasta que el observador termine, sin despertar periódicamente
         try:
-            while True:
-                time.sleep(1)
+            observer.join()
         except KeyboardInterrupt:
             observer.stop()
-            logger.info("Deteniendo monitor de metadatos...")
-            self.send_telegram_message("🔴 Monitor de metadatos detenido")
-            # Limpiar carpeta temporal
-            shutil.rmtree(self.temp_folder, ignore_errors=True)
+            observer.join()
         
-        observer.join()
+        self._shutdown()
+
+    def stop(self):
+        """Solicita la parada del monitor en cualquiera de los dos modos"""
+        self._stop_event.set()
+        if self._observer is not None:
+            self._observer.stop()
+
+    def _shutdown(self):
+        """Notifica la parada y libera los recursos del monitor"""
+        logger.info("Deteniendo monitor de metadatos...")
+        self.send_telegram_message("🔴 Monitor de metadatos detenido")
+        self.close()
 
 
 class MetadataEventHandler(FileSystemEventHandler):
     """Manejador de eventos del sistema de archivos para watchdog"""
     
+    # Segundos durante los que se ignoran nuevos eventos de un archivo ya procesado
+    DEBOUNCE_SECONDS = 5.0
+    # Intervalo entre comprobaciones del tamaño para saber si el archivo terminó de escribirse
+    READY_POLL_SECONDS = 1.0
+    # Número de versiones de archivo ya procesadas que se recuerdan
+    FINGERPRINT_CACHE_SIZE = 1024
+    # Marca de un archivo reservado cuya comprobación o procesamiento sigue en curso
+    PENDING = float('inf')
+    
     def __init__(self, metadata_cleaner):
         self.cleaner = metadata_cleaner
-        self.temp_folder = metadata_cleaner.temp_folder
-        # Agregar un conjunto para rastrear archivos procesados recientemente para evitar duplicados
-        self.recently_processed = set()
+        # Archivos procesados recientemente y hasta cuándo ignorar sus eventos (time.monotonic).
+        # Los que están en curso no caducan (PENDING) hasta que _release los libera.
+        self.recently_processed = {}
+        # Huellas (ruta, mtime, tamaño) de las versiones ya procesadas, en orden LRU
+        self._fingerprints = OrderedDict()
+        self._lock = threading.Lock()
+        # Comprobaciones de tamaño pendientes (montículo por hora de vencimiento), atendidas
+        # por un único hilo en lugar de un temporizador por archivo
+        self._checks = []
+        self._checks_counter = itertools.count()
+        self._checks_cv = threading.Condition()
+        self._checks_thread = threading.Thread(target=self._checks_worker, daemon=True)
+        self._checks_thread.start()
+
+    def _claim(self, path):
+        """Reserva un archivo para procesarlo si no está en curso ni se procesó recientemente"""
+        now = time.monotonic()
+        with self._lock:
+            if self.recently_processed.get(path, 0) > now:
+                return False
+            # Sin caducidad: un archivo que sigue creciendo no debe abrir una segunda cadena de comprobaciones
+            self.recently_processed[path] = self.PENDING
+            # Olvidar las entradas caducadas para que el diccionario no crezca indefinidamente
+            if len(self.recently_processed) > 1024:
+                self.recently_processed = {p: t for p, t in self.recently_processed.items() if t > now}
+            return True
+
+    def _release(self, path):
+        """Ignora los eventos del archivo durante un tiempo tras procesarlo (p. ej. los de la propia limpieza)"""
+        with self._lock:
+            self.recently_processed[path] = time.monotonic() + self.DEBOUNCE_SECONDS
+
+    @staticmethod
+    def _fingerprint(path):
+        """Calcula la huella de la versión actual de un archivo, o None si no existe"""
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        return hashlib.sha1(f"{path}|{st.st_mtime_ns}|{st.st_size}".encode()).digest()
+
+    def _remember(self, fingerprint):
+        """
+        Añade una huella a la caché LRU, descartando la más antigua si está llena
+        
+        La consulta y la inserción se hacen con un único bloqueo, para que dos
+        eventos de la misma versión no la den a la vez por nueva.
+        
+        Returns:
+            bool: True si la huella no estaba en la caché
+        """
+        if fingerprint is None:
+            return True
+        with self._lock:
+            is_new = fingerprint not in self._fingerprints
+            self._fingerprints[fingerprint] = None
+            self._fingerprints.move_to_end(fingerprint)
+            if len(self._fingerprints) > self.FINGERPRINT_CACHE_SIZE:
+                self._fingerprints.popitem(last=False)
+            return is_new
+
+    def _when_ready(self, path, callback, last_size=None):
+        """Programa una comprobación de si el archivo terminó de escribirse"""
+        due = time.monotonic() + self.READY_POLL_SECONDS
+        with self._checks_cv:
+            heapq.heappush(self._checks, (due, next(self._checks_counter), path, callback, last_size))
+            self._checks_cv.notify()
+
+    def _checks_worker(self):
+        """Hilo que ejecuta las comprobaciones de tamaño pendientes cuando vencen"""
+        while True:
+            with self._checks_cv:
+                while not self._checks:
+                    self._checks_cv.wait()
+                delay = self._checks[0][0] - time.monotonic()
+                if delay > 0:
+                    self._checks_cv.wait(delay)
+                    continue
+                _, _, path, callback, last_size = heapq.heappop(self._checks)
+            try:
+                self._check_ready(path, callback, last_size)
+            except Exception as e:
+                logger.error(f"Error al comprobar {path}: {str(e)}")
+                self._release(path)
+
+    def _check_ready(self, path, callback, last_size):
+        """Comprueba si el archivo terminó de escribirse y, si no, vuelve a programar la comprobación"""
+        try:
+            size = os.path.getsize(path)
+        except OSError:
+            # El archivo desapareció antes de poder procesarlo
+            self._release(path)
+            return
+        
+        if size != last_size:
+            self._when_ready(path, callback, size)
+            return
+        
+        # Un mismo guardado puede generar varios eventos: no repetir una versión ya procesada
+        fingerprint = self._fingerprint(path)
+        if not self._remember(fingerprint):
+            self._release(path)
+            return
+        
+        # El procesamiento va al pool del limpiador: número de hilos acotado, ExifTool
+        # serializado por _et_lock y QPDF o PIL/libvips en paralelo
+        try:
+            self.cleaner.submit(self._run, path, callback)
+        except RuntimeError:
+            # El pool ya se cerró porque el monitor se está deteniendo
+            self._release(path)
+
+    def _run(self, path, callback):
+        """Ejecuta el procesamiento de un archivo en el pool de hilos del limpiador"""
+        try:
+            callback(path)
+        finally:
+            # Recordar también la versión resultante de la limpieza
+            self._remember(self._fingerprint(path))
+            self._release(path)
 
     def on_created(self, event):
         """Evento cuando se crea un nuevo archivo"""
-        if event.is_directory or self.temp_folder in event.src_path:
+        if event.is_directory or is_temp_file(event.src_path):
+            return
+        
+        # Ignorar los tipos de archivo que no pueden contener metadatos, igual que al escanear
+        if os.path.splitext(event.src_path)[1].lower() not in SUPPORTED_EXTENSIONS:
             return
             
         # Evitar procesamiento duplicado
-        if event.src_path in self.recently_processed:
+        if not self._claim(event.src_path):
             return
-            
-        self.recently_processed.add(event.src_path)
-        # Eliminar del conjunto después de 5 segundos para evitar duplicados pero permitir cambios reales
-        time.sleep(1)  # Esperar un momento para que el archivo termine de escribirse
         
-        try:
-            if os.path.exists(event.src_path):
-                logger.info(f"Nuevo archivo detectado: {event.src_path}")
-                has_meta, metadata = self.cleaner.has_metadata(event.src_path)
-                
-                if has_meta:
-                    relative_path = os.path.relpath(event.src_path, self.cleaner.folder_path)
-                    # Usar el serializador personalizado
-                    metadata_str = json.dumps(custom_json_serializer(metadata), indent=2) if isinstance(metadata, dict) else str(metadata)
-                    
-                    # Limitar longitud
-                    if len(metadata_str) > 500:
-                        metadata_str = metadata_str[:500] + "... [truncado]"
-                    
-                    message = (
-                        f"🆕 <b>Nuevo archivo con metadatos:</b>\n"
-                        f"📁 {relative_path}\n"
-                        f"📊 <pre>{metadata_str}</pre>"
-                    )
-                    
-                    self.cleaner.send_telegram_message(message)
-                    
-                    # Limpiar metadatos
-                    if self.cleaner.clean_metadata(event.src_path):
-                        self.cleaner.send_telegram_message(f"✅ Metadatos eliminados de: {relative_path}")
-                        logger.info(f"Metadatos eliminados de: {event.src_path}")
-                    else:
-                        self.cleaner.send_telegram_message(f"❌ Error al eliminar metadatos de: {relative_path}")
-                        logger.error(f"Error al eliminar metadatos de: {event.src_path}")
-        except Exception as e:
-            logger.error(f"Error al procesar archivo creado {event.src_path}: {str(e)}")
-        finally:
-            # Limpiar de la lista de procesados después de un tiempo
-            time.sleep(4)
-            if event.src_path in self.recently_processed:
-                self.recently_processed.remove(event.src_path)
+        self._when_ready(event.src_path, self._process_created)
 
     def on_modified(self, event):
         """Evento cuando se modifica un archivo"""
-        if event.is_directory or self.temp_folder in event.src_path:
+        if event.is_directory or is_temp_file(event.src_path):
+            return
+        
+        # Ignorar los tipos de archivo que no pueden contener metadatos, igual que al escanear
+        if os.path.splitext(event.src_path)[1].lower() not in SUPPORTED_EXTENSIONS:
             return
             
         # Evitar procesamiento duplicado
-        if event.src_path in self.recently_processed:
+        if not self._claim(event.src_path):
             return
-            
-        self.recently_processed.add(event.src_path)
         
+        self._when_ready(event.src_path, self._process_modified)
+
+    def _process_created(self, path):
+        """Analiza y limpia un archivo nuevo"""
         try:
-            # Procesar solo algunas modificaciones para evitar duplicados
-            # (los sistemas de archivos a veces generan múltiples eventos)
-            file_ext = os.path.splitext(event.src_path)[1].lower()
-            relevant_extensions = ('.jpg', '.jpeg', '.png', '.pdf', '.docx', '.doc', 
-                                  '.pptx', '.xlsx', '.xls', '.mp3', '.mp4', '.avi')
-            
-            if os.path.exists(event.src_path) and file_ext in relevant_extensions:
-                logger.info(f"Archivo modificado: {event.src_path}")
-                has_meta, metadata = self.cleaner.has_metadata(event.src_path)
-                
-                if has_meta:
-                    relative_path = os.path.relpath(event.src_path, self.cleaner.folder_path)
-                    # Usar el serializador personalizado
-                    metadata_str = json.dumps(custom_json_serializer(metadata), indent=2) if isinstance(metadata, dict) else str(metadata)
-                    
-                    # Limitar longitud
-                    if len(metadata_str) > 500:
-                        metadata_str = metadata_str[:500] + "... [truncado]"
-                    
-                    message = (
-                        f"🔄 <b>Archivo modificado con metadatos:</b>\n"
-                        f"📁 {relative_path}\n"
-                        f"📊 <pre>{metadata_str}</pre>"
-                    )
-                    
-                    self.cleaner.send_telegram_message(message)
-                    
-                    # Limpiar metadatos
-                    if self.cleaner.clean_metadata(event.src_path):
-                        self.cleaner.send_telegram_message(f"✅ Metadatos eliminados de: {relative_path}")
-                        logger.info(f"Metadatos eliminados de: {event.src_path}")
-                    else:
-                        self.cleaner.send_telegram_message(f"❌ Error al eliminar metadatos de: {relative_path}")
-                        logger.error(f"Error al eliminar metadatos de: {event.src_path}")
+            logger.info(f"Nuevo archivo detectado: {path}")
+            self.cleaner.process_file(path, "🆕 <b>Nuevo archivo con metadatos:</b>")
         except Exception as e:
-            logger.error(f"Error al procesar archivo modificado {event.src_path}: {str(e)}")
-        finally:
-            # Limpiar de la lista de procesados después de un tiempo
-            time.sleep(4)
-            if event.src_path in self.recently_processed:
-                self.recently_processed.remove(event.src_path)
+            logger.error(f"Error al procesar archivo creado {path}: {str(e)}")
+
+    def _process_modified(self, path):
+        """Analiza y limpia un archivo modificado"""
+        try:
+            logger.info(f"Archivo modificado: {path}")
+            self.cleaner.process_file(path, "🔄 <b>Archivo modificado con metadatos:</b>")
+        except Exception as e:
+            logger.error(f"Error al procesar archivo modificado {path}: {str(e)}")
 
 
 def main():
@@ -504,6 +1199,11 @@ def main():
     parser.add_argument('--interval', type=int, default=60, help='Intervalo de escaneo en segundos (modo schedule)')
     parser.add_argument('--mode', choices=['schedule', 'watchdog'], default='watchdog', 
                         help='Modo de funcionamiento: schedule (escaneo periódico) o watchdog (monitoreo de eventos)')
+    report_group = parser.add_mutually_exclusive_group()
+    report_group.add_argument('--report-only', action='store_true',
+                              help='Solo notificar los metadatos encontrados, sin limpiarlos')
+    report_group.add_argument('--report-tags', action='store_true',
+                              help='Notificar los metadatos encontrados antes de limpiarlos (más lento)')
     
     args = parser.parse_args()
     
@@ -517,9 +1217,14 @@ def main():
         folder_path=args.folder,
         telegram_token=args.token,
         chat_id=args.chat,
-        interval=args.interval
+        interval=args.interval,
+        report_only=args.report_only,
+        report_tags=args.report_tags
     )
     
+    # Detener el monitor de forma ordenada al recibir SIGTERM (p. ej. systemctl stop o docker stop)
+    signal.signal(signal.SIGTERM, lambda signum, frame: cleaner.stop())
+    
     # Ejecutar en el modo seleccionado
     if args.mode == 'schedule':
         logger.info(f"Iniciando en modo schedule (intervalo: {args.interval} segundos)")